@@ -5,14 +5,16 @@
 """
 
 import hashlib
+import json
 import os
 import shutil
 import sys
 import zipfile
 
+from concurrent.futures import ProcessPoolExecutor
 from xml.etree import ElementTree
 
-SCRIPT_VERSION = 5
+SCRIPT_VERSION = 6
 KODI_VERSIONS = ["krypton", "leia", "matrix", "nexus", "repo"]
 IGNORE = [
     ".git",
@@ -23,6 +25,11 @@ IGNORE = [
     ".idea",
     "venv",
 ]
+ADDON_XPATH = "addon[@id='{}']"
+MANIFEST_FILE = ".manifest.json"
+# Fixed metadata for every zip entry, so unchanged inputs give identical zips
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_FILE_MODE = 0o644 << 16
 _COLOR_ESCAPE = "\x1b[{}m"
 _COLORS = {
     "black": "30",
@@ -131,6 +138,15 @@ def convert_bytes(num):
         num /= 1024.0
 
 
+def _package_addon(release_path, zips_path, folder, addon_id, version, files):
+    """
+    Worker task for one add-on of one release: builds its zip and copies
+    its meta files. Runs in a pool process, so it only takes plain values.
+    """
+    Generator._create_zip(zips_path, addon_id, version, files)
+    Generator._copy_meta_files(release_path, folder, os.path.join(zips_path, addon_id))
+
+
 class Generator:
     """
     Generates a new addons.xml file from each addons addon.xml file
@@ -138,24 +154,49 @@ class Generator:
     the checked-out repo.
     """
 
-    def __init__(self, release):
+    def __init__(self, release, pool=None):
+        """
+        Packages the release right away, or, given a shared process pool,
+        only queues its add-ons on it and leaves the rest to finish().
+        """
         self.release_path = release
         self.zips_path = os.path.join(self.release_path, "zips")
-        addons_xml_path = os.path.join(self.zips_path, "addons.xml")
-        md5_path = os.path.join(self.zips_path, "addons.xml.md5")
+        self.addons_xml_path = os.path.join(self.zips_path, "addons.xml")
+        self.md5_path = os.path.join(self.zips_path, "addons.xml.md5")
+        self._tasks = []
 
         if not os.path.exists(self.zips_path):
             os.makedirs(self.zips_path)
 
         self._remove_binaries()
 
-        if self._generate_addons_file(addons_xml_path):
+        if pool is None:
+            with ProcessPoolExecutor() as pool:
+                self._submit_addons(pool)
+                self.finish()
+        else:
+            self._submit_addons(pool)
+
+    def finish(self):
+        """
+        Waits for the queued add-ons and writes addons.xml, its md5 and the
+        manifest, then reports the add-ons that were left as they were.
+        """
+        updated = self._generate_addons_file(self.addons_xml_path)
+        self._save_manifest()
+        for addon_id, version in self._skipped:
+            print(
+                "Skipped {} ({}) - unchanged".format(
+                    color_text(addon_id, 'cyan'), color_text(version, 'green')
+                )
+            )
+        if updated:
             print(
-                "Successfully updated {}".format(color_text(addons_xml_path, 'yellow'))
+                "Successfully updated {}".format(color_text(self.addons_xml_path, 'yellow'))
             )
 
-            if self._generate_md5_file(addons_xml_path, md5_path):
-                print("Successfully updated {}".format(color_text(md5_path, 'yellow')))
+            if self._generate_md5_file(self.addons_xml_path, self.md5_path):
+                print("Successfully updated {}".format(color_text(self.md5_path, 'yellow')))
 
     def _remove_binaries(self):
         """
@@ -196,58 +237,44 @@ class Generator:
                             )
                         )
 
-    def _create_zip(self, folder, addon_id, version):
+    @staticmethod
+    def _create_zip(zips_path, addon_id, version, files):
         """
-        Creates a zip file in the zips directory for the given addon.
+        Creates a zip file in the zips directory for the given addon. Entries
+        are written in the given order with fixed timestamps and permissions,
+        so the same files always give a byte-identical zip.
         """
-        addon_folder = os.path.join(self.release_path, folder)
-        zip_folder = os.path.join(self.zips_path, addon_id)
+        zip_folder = os.path.join(zips_path, addon_id)
         if not os.path.exists(zip_folder):
             os.makedirs(zip_folder)
 
         final_zip = os.path.join(zip_folder, "{0}-{1}.zip".format(addon_id, version))
-        if not os.path.exists(final_zip):
-            zip = zipfile.ZipFile(final_zip, "w", compression=zipfile.ZIP_DEFLATED)
-            root_len = len(os.path.dirname(os.path.abspath(addon_folder)))
-
-            for root, dirs, files in os.walk(addon_folder):
-                # remove any unneeded artifacts
-                for i in IGNORE:
-                    if i in dirs:
-                        try:
-                            dirs.remove(i)
-                        except:
-                            pass
-                    for f in files:
-                        if f.startswith(i):
-                            try:
-                                files.remove(f)
-                            except:
-                                pass
-
-                archive_root = os.path.abspath(root)[root_len:]
-
-                for f in files:
-                    fullpath = os.path.join(root, f)
-                    archive_name = os.path.join(archive_root, f)
-                    zip.write(fullpath, archive_name, zipfile.ZIP_DEFLATED)
-
-            zip.close()
-            size = convert_bytes(os.path.getsize(final_zip))
-            print(
-                "Zip created for {} ({}) - {}".format(
-                    color_text(addon_id, 'cyan'),
-                    color_text(version, 'green'),
-                    color_text(size, 'yellow'),
-                )
+        tmp_zip = final_zip + ".tmp"
+        with zipfile.ZipFile(tmp_zip, "w", compression=zipfile.ZIP_DEFLATED) as zip:
+            for fullpath, archive_name in files:
+                info = zipfile.ZipInfo(archive_name, date_time=ZIP_DATE_TIME)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = ZIP_FILE_MODE
+                with open(fullpath, "rb") as f:
+                    zip.writestr(info, f.read())
+        os.replace(tmp_zip, final_zip)
+
+        size = convert_bytes(os.path.getsize(final_zip))
+        print(
+            "Zip created for {} ({}) - {}".format(
+                color_text(addon_id, 'cyan'),
+                color_text(version, 'green'),
+                color_text(size, 'yellow'),
             )
+        )
 
-    def _copy_meta_files(self, addon_id, addon_folder):
+    @staticmethod
+    def _copy_meta_files(release_path, addon_id, addon_folder):
         """
         Copy the addon.xml and relevant art files into the relevant folders in the repository.
         """
 
-        tree = ElementTree.parse(os.path.join(self.release_path, addon_id, "addon.xml"))
+        tree = ElementTree.parse(os.path.join(release_path, addon_id, "addon.xml"))
         root = tree.getroot()
 
         copyfiles = ["addon.xml"]
@@ -259,7 +286,7 @@ class Generator:
                 for art in [a for a in assets if a.text]:
                     copyfiles.append(os.path.normpath(art.text))
 
-        src_folder = os.path.join(self.release_path, addon_id)
+        src_folder = os.path.join(release_path, addon_id)
         for file in copyfiles:
             addon_path = os.path.join(src_folder, file)
             if not os.path.exists(addon_path):
@@ -272,18 +299,8 @@ class Generator:
 
             shutil.copy(addon_path, zips_path)
 
-    def _generate_addons_file(self, addons_xml_path):
-        """
-        Generates a zip for each found addon, and updates the addons.xml file accordingly.
-        """
-        if not os.path.exists(addons_xml_path):
-            addons_root = ElementTree.Element('addons')
-            addons_xml = ElementTree.ElementTree(addons_root)
-        else:
-            addons_xml = ElementTree.parse(addons_xml_path)
-            addons_root = addons_xml.getroot()
-
-        folders = [
+    def _addon_folders(self):
+        return [
             i
             for i in os.listdir(self.release_path)
             if os.path.isdir(os.path.join(self.release_path, i))
@@ -292,39 +309,146 @@ class Generator:
             and os.path.exists(os.path.join(self.release_path, i, "addon.xml"))
         ]
 
-        addon_xpath = "addon[@id='{}']"
-        changed = False
-        for addon in folders:
+    def _addon_files(self, folder):
+        """
+        Lists (path, archive name) for every file to package, in a fixed order.
+        """
+        addon_folder = os.path.abspath(os.path.join(self.release_path, folder))
+        parent = os.path.dirname(addon_folder)
+        files = []
+        for root, dirs, filenames in os.walk(addon_folder):
+            # remove any unneeded artifacts
+            dirs[:] = sorted(d for d in dirs if d not in IGNORE)
+            for f in sorted(filenames):
+                if any(f.startswith(i) for i in IGNORE):
+                    continue
+                fullpath = os.path.join(root, f)
+                files.append((fullpath, os.path.relpath(fullpath, parent).replace(os.sep, "/")))
+        return files
+
+    @staticmethod
+    def _hash_files(files, known):
+        """
+        Returns {archive name: [mtime_ns, size, sha1]}, reusing the hash from
+        the previous run for files whose mtime and size did not change.
+        """
+        hashes = {}
+        for fullpath, archive_name in files:
+            st = os.stat(fullpath)
+            previous = known.get(archive_name)
+            if previous and previous[0] == st.st_mtime_ns and previous[1] == st.st_size:
+                hashes[archive_name] = previous
+                continue
+            with open(fullpath, "rb") as f:
+                hashes[archive_name] = [st.st_mtime_ns, st.st_size, hashlib.sha1(f.read()).hexdigest()]
+        return hashes
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.zips_path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _submit_addons(self, pool):
+        """
+        Queues a packaging task for every addon whose files changed since
+        the last run, whose version is not in addons.xml yet or whose zip
+        is missing. Everything else is skipped without parsing its addon.xml.
+        """
+        if not os.path.exists(self.addons_xml_path):
+            self._addons_xml = ElementTree.ElementTree(ElementTree.Element('addons'))
+        else:
+            self._addons_xml = ElementTree.parse(self.addons_xml_path)
+        addons_root = self._addons_xml.getroot()
+        self._old_manifest = self._load_manifest()
+        self._manifest = {}
+        self._skipped = []
+
+        for addon in self._addon_folders():
             try:
+                files = self._addon_files(addon)
+                previous = self._old_manifest.get(addon, {})
+                hashes = self._hash_files(files, previous.get('files', {}))
+                inputs = hashlib.sha1(
+                    "".join("{}\0{}\n".format(name, hashes[name][2]) for name in sorted(hashes)).encode("utf-8")
+                ).hexdigest()
+
+                if previous.get('inputs') == inputs:
+                    addon_entry = addons_root.find(ADDON_XPATH.format(previous['id']))
+                    final_zip = os.path.join(
+                        self.zips_path, previous['id'], "{0}-{1}.zip".format(previous['id'], previous['version'])
+                    )
+                    if addon_entry is not None and addon_entry.get('version') == previous['version'] \
+                            and os.path.exists(final_zip):
+                        self._manifest[addon] = dict(previous, files=hashes)
+                        self._skipped.append((previous['id'], previous['version']))
+                        continue
+
                 addon_xml_path = os.path.join(self.release_path, addon, "addon.xml")
-                addon_xml = ElementTree.parse(addon_xml_path)
-                addon_root = addon_xml.getroot()
+                addon_root = ElementTree.parse(addon_xml_path).getroot()
                 id = addon_root.get('id')
                 version = addon_root.get('version')
+                if previous.get('inputs') not in (None, inputs) and previous.get('version') == version:
+                    # The zip is rebuilt under the old name, so installs never see the change
+                    print(
+                        "Warning: {} inputs changed but version {} not bumped".format(
+                            color_text(id, 'cyan'), color_text(version, 'red')
+                        )
+                    )
+
+                future = pool.submit(
+                    _package_addon, self.release_path, self.zips_path, addon, id, version, files
+                )
+                entry = {'id': id, 'version': version, 'inputs': inputs, 'files': hashes}
+                self._tasks.append((addon, addon_root, future, entry))
+            except Exception as e:
+                print(
+                    "Excluding {}: {}".format(
+                        color_text(addon, 'yellow'), color_text(e, 'red')
+                    )
+                )
+
+    def _save_manifest(self):
+        """
+        Persists the per-file hashes of every packaged or skipped addon.
+        """
+        if self._manifest == self._old_manifest:
+            return
+        self._save_file(
+            json.dumps(self._manifest, indent=1, sort_keys=True),
+            file=os.path.join(self.zips_path, MANIFEST_FILE),
+        )
 
-                updated = False
-                addon_entry = addons_root.find(addon_xpath.format(id))
-                if addon_entry is not None and addon_entry.get('version') != version:
-                    index = addons_root.findall('addon').index(addon_entry)
-                    addons_root.remove(addon_entry)
-                    addons_root.insert(index, addon_root)
-                    updated = True
-                    changed = True
-                elif addon_entry is None:
-                    addons_root.append(addon_root)
-                    updated = True
-                    changed = True
-
-                if updated:
-                    # Create the zip files
-                    self._create_zip(addon, id, version)
-                    self._copy_meta_files(addon, os.path.join(self.zips_path, id))
+    def _generate_addons_file(self, addons_xml_path):
+        """
+        Waits for the packaging tasks and updates the addons.xml file with
+        every addon that was packaged successfully.
+        """
+        addons_xml = self._addons_xml
+        addons_root = addons_xml.getroot()
+
+        changed = False
+        for addon, addon_root, future, entry in self._tasks:
+            try:
+                future.result()
             except Exception as e:
                 print(
                     "Excluding {}: {}".format(
                         color_text(addon, 'yellow'), color_text(e, 'red')
                     )
                 )
+                continue
+
+            addon_entry = addons_root.find(ADDON_XPATH.format(addon_root.get('id')))
+            if addon_entry is not None:
+                index = addons_root.findall('addon').index(addon_entry)
+                addons_root.remove(addon_entry)
+                addons_root.insert(index, addon_root)
+            else:
+                addons_root.append(addon_root)
+            self._manifest[addon] = entry
+            changed = True
 
         if changed:
             addons_root[:] = sorted(addons_root, key=lambda addon: addon.get('id'))
@@ -374,5 +498,8 @@ class Generator:
 
 
 if __name__ == "__main__":
-    for release in [r for r in KODI_VERSIONS if os.path.exists(r)]:
-        Generator(release)
+    # One pool for all releases, so every add-on of every release is packaged in parallel
+    with ProcessPoolExecutor() as pool:
+        generators = [Generator(release, pool) for release in KODI_VERSIONS if os.path.exists(release)]
+        for generator in generators:
+            generator.finish()
@@ -0,0 +1,216 @@
+"""
+Local stand-in for the streaming site and the EPG host, serving synthetic
+but structurally faithful pages: the schedule JSON, 24-7-channels.php, the
+stream -> iframe -> server lookup chain, HLS manifests and an XMLTV gzip.
+Content is generated from a fixed seed so runs are comparable.
+"""
+
+import gzip
+import hashlib
+import http.server
+import io
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+
+SEED = 20250428
+CATEGORIES = [
+    "Soccer", "Basketball", "Tennis", "Ice Hockey", "American Football", "Baseball",
+    "Motorsport", "Cricket", "Rugby Union", "Boxing", "MMA", "Golf", "Cycling",
+    "Darts", "Snooker", "Volleyball", "Handball", "Horse Racing", "TV Shows", "Athletics",
+]
+COUNTRIES = ["USA", "UK", "Spain", "Canada", "Australia", "Mexico", "Germany", "India",
+             "France", "Portugal", "Italy", "Arabic"]
+NETWORKS = ["ESPN", "FOX Sports", "Sky Sports", "BT Sport", "beIN Sports", "DAZN", "Eurosport",
+            "TNT Sports", "NBC", "CBS", "ABC", "Canal+", "Movistar", "Sport TV", "TSN", "Arena Sport"]
+
+
+def _rng(name):
+    return random.Random("{}:{}".format(SEED, name))
+
+
+def channel_names(count):
+    rng = _rng("channels")
+    names = []
+    for i in range(count):
+        if i % 40 == 39:
+            names.append("18+ Adult Channel {}".format(i))
+        elif i % 7 == 6:
+            names.append("{} {}".format(rng.choice(NETWORKS), i))
+        else:
+            names.append("{} {} {}".format(rng.choice(NETWORKS), i % 9 + 1, rng.choice(COUNTRIES)))
+    return names
+
+
+def channels_page(count):
+    rows = [
+        '<div class="grid-item"><a class="channel" href="/stream/stream-{}.php" target="_blank" '
+        'rel="noopener noreferrer"><span style="color: #000000;"><strong>{}</strong></span></a></div>'.format(i + 1, name)
+        for i, name in enumerate(channel_names(count))
+    ]
+    return (
+        '<!DOCTYPE html><html><head><title>24/7 Channels</title></head><body>\n'
+        '<center><h1 style="color:#fff">24/7 Channels</h1></center>\n<div class="grid-container">\n'
+        + "\n".join(rows)
+        + '\n</div>\n<div id="tab-2" class="tab-content"></div></body></html>\n'
+    )
+
+
+def schedule(events, channel_count):
+    rng = _rng("schedule")
+    day = datetime(2025, 4, 28)
+    data = {}
+    for d in range(2):
+        date_key = "{} - Schedule Time UK GMT".format((day + timedelta(days=d)).strftime("%A %dth %b %Y"))
+        categories = {}
+        for e in range(events // 2):
+            categ = rng.choice(CATEGORIES)
+            prefix = "NBA" if categ == "Basketball" and rng.random() < 0.5 else categ
+            channels = [{"channel_name": "{} {}".format(rng.choice(NETWORKS), rng.randint(1, 9)),
+                         "channel_id": str(rng.randint(1, channel_count))} for _ in range(rng.randint(1, 5))]
+            categories.setdefault(categ, []).append({
+                "time": "{:02d}:{:02d}".format(rng.randint(0, 23), rng.choice([0, 15, 30, 45])),
+                "event": "{} : Team {} vs Team {}".format(prefix, rng.randint(1, 500), rng.randint(1, 500)),
+                "channels": channels if rng.random() < 0.8 else {str(i): c for i, c in enumerate(channels)},
+            })
+        data[date_key] = categories
+    return data
+
+
+def epg_gzip(channel_count, hours=48):
+    """
+    XMLTV guide covering the synthetic channels plus a matching share of
+    unrelated ones, as the real aggregated feed does.
+    """
+    now = int(time.time()) // 3600 * 3600
+    names = channel_names(channel_count)
+
+    def stamp(ts):
+        return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d%H%M%S +0000")
+
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", mtime=0) as gz:
+        out = io.TextIOWrapper(gz, encoding="utf-8")
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n<tv generator-info-name="benchmark">\n')
+        ids = []
+        for i, name in enumerate(names + ["Other Channel {}".format(i) for i in range(channel_count)]):
+            channel_id = "{}.bench".format(name.replace(" ", ".").replace("+", ""))
+            ids.append(channel_id)
+            out.write('<channel id="{}"><display-name lang="en">{}</display-name></channel>\n'.format(channel_id, name))
+        for channel_id in ids:
+            for h in range(-6, hours):
+                start = now + h * 3600
+                out.write(
+                    '<programme start="{}" stop="{}" channel="{}"><title lang="en">Show {}</title>'
+                    '<desc lang="en">Programme {} on {}</desc></programme>\n'.format(
+                        stamp(start), stamp(start + 3600), channel_id, h, h, channel_id))
+        out.write("</tv>\n")
+        out.flush()
+        out.detach()
+    return buf.getvalue()
+
+
+class FakeSite:
+    def __init__(self, channels=900, events=400, latency_ms=0, port=0):
+        self.latency = latency_ms / 1000.0
+        self.channel_count = channels
+        self.schedule = json.dumps(schedule(events, channels)).encode("utf-8")
+        self.channels_page = channels_page(channels).encode("utf-8")
+        self.epg = epg_gzip(channels)
+        self.epg_etag = '"{}"'.format(hashlib.md5(self.epg).hexdigest())
+        self.epg_modified = formatdate(time.time() - 3600, usegmt=True)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = "http://127.0.0.1:{}/".format(self.port)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, ctype="text/html; charset=utf-8", code=200, headers=()):
+                self.send_response(code)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self.do_GET()
+
+            def do_GET(self):
+                with site._lock:
+                    site.requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                path, _, query = self.path.partition("?")
+                while "//" in path:
+                    path = path.replace("//", "/")
+                host = "http://127.0.0.1:{}".format(site.port)
+                if path == "/schedule/schedule-generated.php":
+                    return self._send(site.schedule, "application/json")
+                if path == "/24-7-channels.php":
+                    return self._send(site.channels_page)
+                if path.startswith("/stream/stream-"):
+                    channel_id = path.rsplit("-", 1)[1].split(".")[0]
+                    return self._send('<html><body><iframe src="{}/premiumtv/daddylivehd.php?id={}" width="100%" '
+                                      'height="100%" allowfullscreen></iframe></body></html>'
+                                      .format(host, channel_id).encode("utf-8"))
+                if path == "/premiumtv/daddylivehd.php":
+                    channel_id = query.rsplit("=", 1)[1]
+                    return self._send(("<script>var channelKey = \"premium{}\";\n"
+                                       "fetch('/server_lookup.php?channel_id=' + channelKey).then(r => r.json())"
+                                       ".then(d => load('https://' + d.server_key + '/mono.m3u8'));</script>")
+                                      .format(channel_id).encode("utf-8"))
+                if path == "/server_lookup.php":
+                    return self._send(b'{"server_key":"top1"}', "application/json")
+                if path.endswith("/mono.m3u8"):
+                    return self._send(b"#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:4\n",
+                                      "application/vnd.apple.mpegurl")
+                if path == "/epg.xml.gz":
+                    if self.headers.get("If-None-Match") == site.epg_etag:
+                        return self._send(b"", code=304)
+                    return self._send(site.epg, "application/gzip",
+                                      headers=(("ETag", site.epg_etag), ("Last-Modified", site.epg_modified)))
+                self._send(b"not found", code=404)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--channels", type=int, default=900)
+    parser.add_argument("--events", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0, help="simulated round trip per request, in ms")
+    args = parser.parse_args()
+    site = FakeSite(args.channels, args.events, args.latency, args.port)
+    print("Serving on {}".format(site.url))
+    site.server.serve_forever()
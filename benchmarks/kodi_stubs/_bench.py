@@ -0,0 +1,32 @@
+"""
+Shared state for the Kodi stubs. The benchmark runner passes everything in
+through BENCH_* environment variables, one plugin invocation per process.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+T0 = float(os.environ.get('BENCH_T0') or time.time())
+RESULT_FILE = os.environ.get('BENCH_RESULT')
+# Without the runner these fall back to a scratch directory, never the
+# working directory, which is usually the add-on source tree
+PROFILE = os.environ.get('BENCH_PROFILE') or tempfile.mkdtemp(prefix='daddylive-profile-')
+LOGDIR = os.environ.get('BENCH_LOGDIR') or tempfile.mkdtemp(prefix='daddylive-log-')
+SETTINGS = json.loads(os.environ.get('BENCH_SETTINGS') or '{}')
+
+state = {'items': 0, 'urls': [], 'playing': None}
+
+
+def finished(kind, **extra):
+    """
+    Record how long the invocation took from process spawn to handing the
+    result to Kodi (endOfDirectory or setResolvedUrl).
+    """
+    if not RESULT_FILE:
+        return
+    result = {'kind': kind, 'handoff_ms': (time.time() - T0) * 1000, 'items': state['items'], 'urls': state['urls'][:5]}
+    result.update(extra)
+    with open(RESULT_FILE, 'w') as f:
+        json.dump(result, f)
@@ -0,0 +1,41 @@
+"""
+Minimal stand-in for Kodi's xbmc module.
+"""
+
+import sys
+import time
+
+import _bench
+
+LOGDEBUG = 0
+LOGINFO = 1
+LOGWARNING = 2
+LOGERROR = 3
+
+
+def log(msg, level=LOGDEBUG):
+    if level >= LOGWARNING:
+        sys.stderr.write('{}\n'.format(msg))
+
+
+def getInfoLabel(label):
+    return {'System.BuildVersion': '21.0 (21.0.0) Git:20240404-benchmark'}.get(label, '')
+
+
+class Monitor:
+    def abortRequested(self):
+        return False
+
+    def waitForAbort(self, timeout=0):
+        time.sleep(min(timeout, 0.05))
+        return False
+
+
+class Player:
+    def getPlayingFile(self):
+        if not _bench.state['playing']:
+            raise RuntimeError('Kodi is not playing any file')
+        return _bench.state['playing']
+
+    def isPlaying(self):
+        return bool(_bench.state['playing'])
@@ -0,0 +1,50 @@
+"""
+Minimal stand-in for Kodi's xbmcaddon module. Defaults mirror
+resources/settings.xml; BENCH_SETTINGS overrides them.
+"""
+
+import _bench
+
+DEFAULTS = {
+    'epg_timezone': '0',
+    'time_format': '12h',
+    'dst_enabled': 'false',
+    'baseurl': 'https://daddylive.mp/',
+    'schedule_path': 'schedule/schedule-generated.php',
+    'stream_path': '.newkso.ru',
+    'service_enabled': 'true',
+    'epg_enabled': 'true',
+    'debug_logging': 'false',
+    'adult_pw': '',
+}
+
+
+class Addon:
+    def __init__(self, id='plugin.video.daddylivehd'):
+        self._id = id
+
+    def getSetting(self, key):
+        return _bench.SETTINGS.get(key, DEFAULTS.get(key, ''))
+
+    def getSettingBool(self, key):
+        return self.getSetting(key) == 'true'
+
+    def getSettingInt(self, key):
+        return int(self.getSetting(key) or 0)
+
+    def setSetting(self, key, value):
+        _bench.SETTINGS[key] = value
+
+    def getAddonInfo(self, key):
+        return {
+            'id': self._id,
+            'profile': 'special://profile/addon_data/plugin.video.daddylivehd/',
+            'icon': 'resources/icon.png',
+            'fanart': '',
+        }.get(key, '')
+
+    def getLocalizedString(self, string_id):
+        return str(string_id)
+
+    def openSettings(self):
+        pass
@@ -0,0 +1,53 @@
+"""
+Minimal stand-in for Kodi's xbmcgui module.
+"""
+
+
+class _InfoTag:
+    def setMediaType(self, value):
+        pass
+
+    def setTitle(self, value):
+        pass
+
+    def setPlot(self, value):
+        pass
+
+
+class ListItem:
+    def __init__(self, label='', label2='', path='', offscreen=False):
+        self.label = label
+        self.path = path
+        self.properties = {}
+
+    def setInfo(self, kind, labels):
+        pass
+
+    def getVideoInfoTag(self):
+        return _InfoTag()
+
+    def setArt(self, art):
+        pass
+
+    def setProperty(self, key, value):
+        self.properties[key] = value
+
+    def setMimeType(self, mime):
+        pass
+
+    def getPath(self):
+        return self.path
+
+
+class Dialog:
+    def ok(self, heading, message):
+        return True
+
+    def notification(self, heading, message, *args, **kwargs):
+        pass
+
+    def textviewer(self, heading, text):
+        pass
+
+    def input(self, heading, *args, **kwargs):
+        return ''
@@ -0,0 +1,31 @@
+"""
+Minimal stand-in for Kodi's xbmcplugin module.
+"""
+
+import _bench
+
+
+def addDirectoryItem(handle, url, listitem, isFolder=False, totalItems=0):
+    _bench.state['items'] += 1
+    _bench.state['urls'].append(url)
+    return True
+
+
+def addDirectoryItems(handle, items, totalItems=0):
+    for url, listitem, is_folder in items:
+        addDirectoryItem(handle, url, listitem, is_folder)
+    return True
+
+
+def endOfDirectory(handle, succeeded=True, updateListing=False, cacheToDisc=True):
+    _bench.finished('directory', succeeded=succeeded)
+
+
+def setResolvedUrl(handle, succeeded, listitem):
+    # Pretend playback starts straight away so the addon's playback watch returns
+    _bench.state['playing'] = listitem.getPath()
+    _bench.finished('resolved', succeeded=succeeded)
+
+
+def setContent(handle, content):
+    pass
@@ -0,0 +1,19 @@
+"""
+Minimal stand-in for Kodi's xbmcvfs module.
+"""
+
+import os
+
+import _bench
+
+_SPECIAL = {
+    'special://profile/addon_data/plugin.video.daddylivehd/': lambda: _bench.PROFILE,
+    'special://logpath/': lambda: _bench.LOGDIR,
+}
+
+
+def translatePath(path):
+    for prefix, target in _SPECIAL.items():
+        if path.startswith(prefix):
+            return os.path.join(target(), path[len(prefix):])
+    return path
@@ -0,0 +1,228 @@
+"""
+Offline benchmark for plugin.video.daddylivehd.
+
+Every plugin url is run the way Kodi runs it: a fresh interpreter per
+invocation, here with the stub Kodi modules from kodi_stubs/ on the path and
+the add-on pointed at a local fake site (fake_site.py). Each mode is timed
+with an empty profile (cold) and with the caches primed by a previous
+invocation (warm). "zap" is trLinks run right after the trList that lists
+it, starting from an empty profile, i.e. what a user sees when picking a
+channel from an event.
+
+Reported per scenario (medians over --repeat runs):
+    handoff  process spawn -> endOfDirectory / setResolvedUrl
+    wall     process spawn -> interpreter exit (includes background work)
+
+Usage:
+    python benchmarks/run.py [--repeat 5] [--latency 30]
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --compare baseline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from fake_site import FakeSite
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.join(os.path.dirname(HERE), "repo", "plugin.video.daddylivehd")
+STUBS_DIR = os.path.join(HERE, "kodi_stubs")
+PLUGIN_URL = "plugin://plugin.video.daddylivehd/"
+
+LAUNCHER = """
+import runpy, sys
+sys.argv = [{plugin!r}, '1', {query!r}]
+sys.path.insert(0, {addon!r})
+runpy.run_path({script!r}, run_name='__main__')
+"""
+
+EPG_REFRESH = """
+import sys
+sys.path.insert(0, {addon!r})
+from resources.lib import epg, stats
+epg.refresh({url!r})
+stats.save()
+"""
+
+
+class Bench:
+    def __init__(self, site, settings):
+        self.site = site
+        self.settings = settings
+        self.root = tempfile.mkdtemp(prefix="daddylive-bench-")
+        self.profile = os.path.join(self.root, "profile")
+        self.logdir = os.path.join(self.root, "log")
+        os.makedirs(self.logdir)
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def reset_profile(self):
+        shutil.rmtree(self.profile, ignore_errors=True)
+        os.makedirs(self.profile)
+
+    def _run(self, code):
+        result_file = os.path.join(self.root, "result.json")
+        if os.path.exists(result_file):
+            os.remove(result_file)
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join([STUBS_DIR, os.environ.get("PYTHONPATH", "")]),
+            PYTHONDONTWRITEBYTECODE="1",
+            BENCH_T0=repr(time.time()),
+            BENCH_RESULT=result_file,
+            BENCH_PROFILE=self.profile,
+            BENCH_LOGDIR=self.logdir,
+            BENCH_SETTINGS=json.dumps(self.settings),
+        )
+        started = time.time()
+        proc = subprocess.run([sys.executable, "-c", code], cwd=ADDON_DIR, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        wall = (time.time() - started) * 1000
+        if proc.returncode != 0:
+            raise RuntimeError("invocation failed:\n{}".format(proc.stderr))
+        result = {}
+        if os.path.exists(result_file):
+            with open(result_file) as f:
+                result = json.load(f)
+        result["wall_ms"] = wall
+        return result
+
+    def invoke(self, query):
+        script = os.path.join(ADDON_DIR, "addon.py")
+        return self._run(LAUNCHER.format(plugin=PLUGIN_URL, query=query, addon=ADDON_DIR, script=script))
+
+    def refresh_epg(self):
+        return self._run(EPG_REFRESH.format(addon=ADDON_DIR, url=self.site.url + "epg.xml.gz"))
+
+
+def first_query(result):
+    url = (result.get("urls") or [""])[0]
+    return "?" + urlsplit(url).query if url else None
+
+
+def discover(bench):
+    """
+    Walk the menus once to find real category / event / channel urls to time.
+    """
+    bench.reset_profile()
+    scenarios = [("menu", "?"), ("sched", "?mode=menu&serv_type=sched"), ("live_tv", "?mode=menu&serv_type=live_tv")]
+    sched = bench.invoke("?mode=menu&serv_type=sched")
+    show_channels = first_query(sched)
+    if show_channels:
+        scenarios.append(("showChannels", show_channels))
+        tr_list = first_query(bench.invoke(show_channels))
+        if tr_list:
+            scenarios.append(("trList", tr_list))
+            tr_links = first_query(bench.invoke(tr_list))
+            if tr_links:
+                scenarios.append(("trLinks", tr_links))
+                scenarios.append(("zap", tr_links, tr_list))
+    play = first_query(bench.invoke("?mode=menu&serv_type=live_tv"))
+    if play:
+        scenarios.append(("play", play))
+    scenarios.append(("country", "?mode=country&country=USA"))
+    scenarios.append(("search", "?mode=search&query=sky+sp"))
+    scenarios.append(("settings", "?mode=open_settings"))
+    return scenarios
+
+
+def measure(bench, scenarios, repeat):
+    results = {}
+    for name, query, *primers in scenarios:
+        cold, warm = [], []
+        for _ in range(repeat):
+            bench.reset_profile()
+            for primer in primers:
+                bench.invoke(primer)
+            cold.append(bench.invoke(query))
+        bench.reset_profile()
+        bench.refresh_epg()
+        bench.invoke(query)
+        for _ in range(repeat):
+            warm.append(bench.invoke(query))
+        results[name] = summarize(cold, warm)
+    bench.reset_profile()
+    epg_cold = bench.refresh_epg()
+    epg_warm = bench.refresh_epg()
+    results["epg_refresh"] = {"cold_wall_ms": round(epg_cold["wall_ms"], 1), "warm_wall_ms": round(epg_warm["wall_ms"], 1)}
+    return results
+
+
+def summarize(cold, warm):
+    def median(runs, key):
+        values = [r[key] for r in runs if key in r]
+        return round(statistics.median(values), 1) if values else None
+
+    return {
+        "cold_handoff_ms": median(cold, "handoff_ms"),
+        "cold_wall_ms": median(cold, "wall_ms"),
+        "warm_handoff_ms": median(warm, "handoff_ms"),
+        "warm_wall_ms": median(warm, "wall_ms"),
+        "items": warm[-1].get("items") if warm else None,
+    }
+
+
+def report(results):
+    columns = ["cold_handoff_ms", "cold_wall_ms", "warm_handoff_ms", "warm_wall_ms", "items"]
+    print("{:<14}".format("scenario") + "".join("{:>17}".format(c) for c in columns))
+    for name, row in results.items():
+        print("{:<14}".format(name) + "".join("{:>17}".format("-" if row.get(c) is None else row[c]) for c in columns))
+
+
+def compare(results, baseline, tolerance, slack_ms=5.0):
+    regressions = []
+    for name, row in results.items():
+        for key, value in row.items():
+            base = baseline.get(name, {}).get(key)
+            if not key.endswith("_ms") or value is None or base is None:
+                continue
+            if value > base * (1 + tolerance) + slack_ms:
+                regressions.append("{} {}: {} ms -> {} ms".format(name, key, base, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=30, help="simulated round trip per request, in ms")
+    parser.add_argument("--channels", type=int, default=900)
+    parser.add_argument("--events", type=int, default=400)
+    parser.add_argument("--save", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against --compare")
+    args = parser.parse_args()
+
+    site = FakeSite(args.channels, args.events, args.latency).start()
+    settings = {"baseurl": site.url, "schedule_path": "schedule/schedule-generated.php"}
+    bench = Bench(site, settings)
+    try:
+        results = measure(bench, discover(bench), args.repeat)
+    finally:
+        bench.close()
+        site.stop()
+
+    report(results)
+    print("\n{} requests served by the fake site".format(site.requests))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION {}".format(line))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
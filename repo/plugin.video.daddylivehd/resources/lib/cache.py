@@ -0,0 +1,128 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import os
+import json
+import hashlib
+import time
+import threading
+import xbmcvfs
+import xbmcaddon
+from resources.lib import stats
+
+# Kodi starts a new interpreter for every plugin url, so anything that should
+# survive between invocations has to live on disk in the addon profile.
+PROFILE = xbmcvfs.translatePath(xbmcaddon.Addon(id='plugin.video.daddylivehd').getAddonInfo('profile'))
+CACHE_DIR = os.path.join(PROFILE, 'cache')
+STAMP_LENGTH = len('{"digest":""') + 40
+
+def path(name):
+    return os.path.join(CACHE_DIR, name)
+
+def _entry_path(name):
+    return path(name + '.json')
+
+def atomic_write(file_path, data, mode='w'):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        if 'b' in mode:
+            with open(tmp, mode) as f:
+                f.write(data)
+        else:
+            with open(tmp, mode, encoding='utf-8') as f:
+                f.write(data)
+        os.replace(tmp, file_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def read(name):
+    try:
+        with open(_entry_path(name), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        return entry['data'], max(0, time.time() - entry['ts'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+def stamp(name):
+    # Cheap change marker for an entry without parsing it: write() puts the
+    # digest of the data first, so storing the same data again keeps it
+    try:
+        with open(_entry_path(name), 'r', encoding='utf-8') as f:
+            return f.read(STAMP_LENGTH)
+    except OSError:
+        return None
+
+def age(name):
+    try:
+        return max(0, time.time() - os.path.getmtime(_entry_path(name)))
+    except OSError:
+        return None
+
+def write(name, data):
+    body = json.dumps(data, separators=(',', ':'))
+    digest = hashlib.sha1(body.encode('utf-8')).hexdigest()
+    atomic_write(_entry_path(name), f'{{"digest":"{digest}","ts":{time.time()!r},"data":{body}}}')
+
+def _revalidate(name, fetch):
+    try:
+        write(name, fetch())
+    except Exception:
+        pass
+
+def get(name, fetch, ttl, stale=0):
+    # Fresh entries are returned as is. Entries inside the stale window are
+    # returned immediately and refreshed on a background thread, which Kodi
+    # lets finish after the directory has been rendered. Anything older is
+    # fetched in the foreground, falling back to the expired copy on failure.
+    data, age = read(name)
+    if data is not None and age < ttl:
+        stats.count(name, True)
+        return data
+    if data is not None and age < ttl + stale:
+        stats.count(name, True)
+        threading.Thread(target=_revalidate, args=(name, fetch)).start()
+        return data
+    stats.count(name, False)
+    try:
+        data_new = fetch()
+    except Exception:
+        if data is not None:
+            return data
+        raise
+    try:
+        write(name, data_new)
+    except OSError:
+        pass
+    return data_new
+
+def derived(name, source, load_source, build, ttl, key=None, update=None):
+    # Data computed from another entry (e.g. an index over a fetched list).
+    # It is rebuilt locally whenever the source entry changed, for example
+    # after a refresh by the background service, or when key (settings the result
+    # depends on) changes. load_source goes through the usual fetch path once
+    # the source itself is older than ttl. With update, a result built under
+    # the same key is brought up to date with update(previous, source)
+    # instead of being built from scratch.
+    entry = read(name)[0]
+    source_age = age(source)
+    if (entry and entry.get('key') == key and entry.get('source') == stamp(source)
+            and source_age is not None and source_age < ttl):
+        stats.count(name, True)
+        return entry['data']
+    stats.count(name, False)
+    data = load_source()
+    with stats.span(f'build.{name}'):
+        if update and entry and entry.get('key') == key:
+            data = update(entry['data'], data)
+        else:
+            data = build(data)
+    try:
+        write(name, {'key': key, 'source': stamp(source), 'data': data})
+    except OSError:
+        pass
+    return data
@@ -0,0 +1,264 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import os
+import glob
+import time
+import calendar
+import sqlite3
+from contextlib import closing
+from resources.lib import cache, livetv, net, sources, stats
+
+EPG_URL = 'https://epgshare01.online/epgshare01/epg_ripper_ALL_SOURCES1.xml.gz'
+EPG_DB = cache.path('epg.db')
+EPG_MIRROR = cache.path('epg.xml.gz')
+EPG_TTL = 12 * 3600
+MAX_PROGRAMME_LENGTH = 24 * 3600
+
+class Aborted(Exception):
+    # Kodi is shutting down; whatever was written so far is left for the next run
+    pass
+
+SCHEMA = '''
+CREATE TABLE programmes (channel TEXT NOT NULL, start INTEGER NOT NULL, stop INTEGER NOT NULL, title TEXT, desc TEXT);
+CREATE TABLE channels (id TEXT NOT NULL, name TEXT NOT NULL);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+'''
+
+def xmltv_time(value):
+    # "YYYYmmddHHMMSS +hhmm" -> unix time; strptime is far too slow for a full guide
+    value = value.strip()
+    ts = calendar.timegm((int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                          int(value[8:10]), int(value[10:12]), int(value[12:14] or 0)))
+    offset = value[14:].strip()
+    if len(offset) == 5 and offset[0] in '+-':
+        minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+        ts -= minutes * 60 if offset[0] == '+' else -minutes * 60
+    return ts
+
+def _text(elem, tag):
+    text = elem.findtext(tag)
+    return text.strip() if text else None
+
+def ingest(fileobj, db_path=EPG_DB, batch_size=5000, validator=None, should_stop=lambda: False):
+    # Stream the XMLTV document into a fresh database next to the live one and
+    # swap it in when complete, so readers never see a half-written index.
+    # Elements are dropped from the tree as soon as they are stored.
+    import xml.etree.ElementTree as ET
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    # Only the service ingests, so a fixed name is safe and a copy left by a
+    # crash is replaced on the next run. Older versions added the pid.
+    tmp = f'{db_path}.tmp'
+    for leftover in [tmp] + glob.glob(f'{glob.escape(db_path)}.*.tmp'):
+        try:
+            os.remove(leftover)
+        except OSError:
+            pass
+    try:
+        with closing(sqlite3.connect(tmp)) as conn:
+            conn.execute('PRAGMA journal_mode=OFF')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.executescript(SCHEMA)
+            insert = 'INSERT INTO programmes VALUES (?, ?, ?, ?, ?)'
+            batch = []
+            channel_names = []
+            count = 0
+            context = ET.iterparse(fileobj, events=('start', 'end'))
+            _, root = next(context)
+            for event, elem in context:
+                if event != 'end' or elem.tag not in ('programme', 'channel'):
+                    continue
+                if elem.tag == 'channel':
+                    channel_names.extend((elem.get('id'), name.text.strip()) for name in elem.iter('display-name')
+                                         if elem.get('id') and name.text and name.text.strip())
+                elif elem.tag == 'programme' and elem.get('channel'):
+                    try:
+                        batch.append((elem.get('channel'), xmltv_time(elem.get('start')), xmltv_time(elem.get('stop')),
+                                      _text(elem, 'title'), _text(elem, 'desc')))
+                    except (AttributeError, ValueError):
+                        pass
+                    if len(batch) >= batch_size:
+                        if should_stop():
+                            raise Aborted()
+                        conn.executemany(insert, batch)
+                        count += len(batch)
+                        batch = []
+                root.clear()
+            conn.executemany(insert, batch)
+            count += len(batch)
+            conn.executemany('INSERT INTO channels VALUES (?, ?)', channel_names)
+            conn.execute('CREATE INDEX idx_programmes_channel_start ON programmes (channel, start)')
+            conn.execute('INSERT INTO meta VALUES (?, ?)', ('ingested', str(int(time.time()))))
+            # The mirror version this index was built from, see refresh()
+            conn.execute('INSERT INTO meta VALUES (?, ?)', ('validator', validator))
+            conn.commit()
+        os.replace(tmp, db_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return count
+
+def _meta(key, db_path):
+    if not os.path.exists(db_path):
+        return None
+    try:
+        with closing(sqlite3.connect(db_path)) as conn:
+            row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+
+def ingested(db_path=EPG_DB):
+    return _meta('ingested', db_path)
+
+def mirror_validator():
+    meta = cache.read('epg_mirror')[0] or {}
+    return meta.get('etag') or meta.get('last_modified')
+
+def _promote(part, mirror, meta):
+    os.replace(part, mirror)
+    cache.write('epg_mirror', {'etag': meta.get('part_etag'), 'last_modified': meta.get('part_last_modified')})
+    return True
+
+def download(epg_url, mirror=EPG_MIRROR, chunk_size=256 * 1024, should_stop=lambda: False):
+    # Keep a local copy of the guide and only transfer it again when the
+    # server says it changed. Interrupted transfers are resumed from the
+    # .part file as long as the server still has the same version, which
+    # also covers a transfer stopped by should_stop.
+    # Returns True when the mirror was replaced.
+    meta = cache.read('epg_mirror')[0] or {}
+    part = mirror + '.part'
+    headers = {}
+    offset = 0
+    if os.path.exists(part) and meta.get('part'):
+        offset = os.path.getsize(part)
+        if meta.get('part_length') and offset >= meta['part_length']:
+            # Killed between the last write and the rename
+            return _promote(part, mirror, meta)
+        headers['Range'] = f'bytes={offset}-'
+        headers['If-Range'] = meta['part']
+    elif os.path.exists(mirror):
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    with net.get(epg_url, headers=headers, stream=True, timeout=30) as response:
+        if response.status_code == 304:
+            return False
+        if response.status_code != 416 or not offset:
+            response.raise_for_status()
+            if response.status_code != 206:
+                offset = 0
+            if offset == 0:
+                length = response.headers.get('Content-Length')
+                meta.update({'part': response.headers.get('ETag') or response.headers.get('Last-Modified'),
+                             'part_etag': response.headers.get('ETag'),
+                             'part_last_modified': response.headers.get('Last-Modified'),
+                             'part_length': int(length) if length and length.isdigit() else None})
+                cache.write('epg_mirror', meta)
+            with open(part, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size):
+                    if should_stop():
+                        raise Aborted()
+                    f.write(chunk)
+            return _promote(part, mirror, meta)
+    # The server has nothing past the end of the .part file, which therefore
+    # cannot be trusted to be complete: start over with a full download
+    os.remove(part)
+    for key in ('part', 'part_etag', 'part_last_modified', 'part_length'):
+        meta.pop(key, None)
+    cache.write('epg_mirror', meta)
+    return download(epg_url, mirror, chunk_size, should_stop)
+
+def refresh(epg_url, db_path=EPG_DB, mirror=EPG_MIRROR, should_stop=lambda: False):
+    # A 304 only means the mirror is current; the index may still have been
+    # built from an older mirror if the last ingest failed or was killed
+    import gzip
+    changed = download(epg_url, mirror, should_stop=should_stop)
+    validator = mirror_validator()
+    if not changed and validator and _meta('validator', db_path) == validator:
+        # Unchanged upstream; mark the index as checked
+        os.utime(db_path)
+        return 0
+    with stats.span('epg.ingest'), gzip.open(mirror, 'rb') as f:
+        return ingest(f, db_path, validator=validator, should_stop=should_stop)
+
+def has_index(db_path=EPG_DB):
+    return os.path.exists(db_path)
+
+def now_next_bulk(channel_ids, count=2, window=12 * 3600, db_path=EPG_DB, chunk_size=500):
+    # Current and following programmes for many channels at once, as
+    # channel -> [programme, ...]. One range query per chunk of ids keeps
+    # under SQLite's bound parameter limit.
+    with stats.span('epg.now_next'):
+        return _now_next_bulk(list(channel_ids), count, window, db_path, chunk_size)
+
+def _now_next_bulk(channel_ids, count, window, db_path, chunk_size):
+    now = int(time.time())
+    guide = {}
+    with closing(sqlite3.connect(db_path)) as conn:
+        for i in range(0, len(channel_ids), chunk_size):
+            chunk = channel_ids[i:i + chunk_size]
+            rows = conn.execute(
+                'SELECT channel, start, stop, title, desc FROM programmes '
+                f'WHERE channel IN ({",".join("?" * len(chunk))}) AND start > ? AND start < ? AND stop > ? '
+                'ORDER BY channel, start',
+                chunk + [now - MAX_PROGRAMME_LENGTH, now + window, now]).fetchall()
+            for r in rows:
+                programmes = guide.setdefault(r[0], [])
+                if len(programmes) < count:
+                    programmes.append({'start': r[1], 'stop': r[2], 'title': r[3], 'desc': r[4]})
+    return guide
+
+IGNORED_NAME_TOKENS = {'hd', 'fhd', 'uhd', 'sd', '4k', 'tv', 'channel'}
+
+def match_key(name):
+    return ' '.join(t for t in livetv.tokens(name) if t not in IGNORED_NAME_TOKENS)
+
+def id_country(channel_id):
+    # epgshare ids look like "Fox.News.us" or "us-foxnews"
+    channel_id = channel_id.lower()
+    if '.' in channel_id:
+        return channel_id.rsplit('.', 1)[1]
+    return channel_id.split('-', 1)[0]
+
+def match_channels(names, overrides, db_path=EPG_DB):
+    # Map scraped channel names to XMLTV ids by comparing normalized names
+    # with the guide's display names, with and without the country suffix.
+    # When several ids share a display name, the one whose country code
+    # agrees with the channel's country is preferred.
+    candidates = {}
+    with closing(sqlite3.connect(db_path)) as conn:
+        for channel_id, display_name in conn.execute('SELECT id, name FROM channels'):
+            key = match_key(display_name)
+            if key and channel_id not in candidates.setdefault(key, []):
+                candidates[key].append(channel_id)
+    matches = {}
+    for name in names:
+        if name in overrides:
+            matches[name] = overrides[name]
+            continue
+        country = livetv.country_of(name)
+        codes = livetv.COUNTRIES.get(country, [])
+        words = match_key(name).split()
+        keys = [' '.join(words)]
+        if country != livetv.MISC and len(words) > 1 and words[-1] in codes:
+            keys.append(' '.join(words[:-1]))
+        for key in keys:
+            ids = candidates.get(key)
+            if ids:
+                matches[name] = next((i for i in ids if id_country(i) in codes), ids[0])
+                break
+    return matches
+
+def get_matches(load_channels, overrides, db_path=EPG_DB):
+    # Persisted name -> id map, recomputed only after a new ingest or a new channel list
+    stamp = ingested(db_path)
+    if stamp is None:
+        return dict(overrides)
+    return cache.derived('epg_matches', 'channels', load_channels,
+                         lambda all_channels: match_channels([c[1] for c in all_channels], overrides, db_path),
+                         sources.CACHE_TTL, stamp)
@@ -0,0 +1,93 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import time
+import threading
+from urllib.parse import urlparse
+from resources.lib import cache, resolver
+
+HEALTH_INTERVAL = 6 * 3600
+HEALTH_TTL = 24 * 3600  # older results count as unchecked
+WORKERS = 4
+HOST_INTERVAL = 0.5  # minimum seconds between two requests to the same host
+PROBE_TIMEOUT = 8
+
+# Listing order for working, unchecked and dead channels
+OK, UNKNOWN, DEAD = 0, 1, 2
+
+class HostLimiter:
+    # Hands out request slots per host, one every interval seconds, so a
+    # full pass never hammers the site or a single stream server
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, 0))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def check(link, referer, paths, limiter):
+    # Resolves the channel and fetches its manifest from the configured hosts
+    # in turn; a channel is alive if any of them serves a playlist. Every
+    # request, including each step of the resolve chain, waits for its host.
+    try:
+        resolved = resolver.resolve(link, referer, limiter.wait)
+    except Exception:
+        return {'ok': False, 'ms': None, 'ts': time.time()}
+    headers = resolver.stream_headers(resolved)
+    for path in paths:
+        url = resolver.manifest_url(resolved, path)
+        limiter.wait(url)
+        latency = resolver.probe(url, headers, PROBE_TIMEOUT)
+        if latency is not None:
+            return {'ok': True, 'ms': round(latency, 1), 'ts': time.time()}
+    return {'ok': False, 'ms': None, 'ts': time.time()}
+
+def run(all_channels, baseurl, paths, should_stop=lambda: False):
+    # One pass over every channel on a bounded pool. Results replace the
+    # previous pass, unless nothing at all answered, which says more about
+    # the network than about the channels. Returns (working, dead) counts.
+    limiter = HostLimiter(HOST_INTERVAL)
+    results = {}
+
+    def task(channel):
+        if should_stop():
+            return
+        link = baseurl + channel[0]
+        results[resolver.channel_key(link)] = check(link, baseurl, paths, limiter)
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(task, all_channels))
+    working = sum(1 for r in results.values() if r['ok'])
+    if working and not should_stop():
+        cache.write('health', results)
+    return working, len(results) - working
+
+def load():
+    return cache.read('health')[0] or {}
+
+def state(results, path, now=None):
+    result = results.get(resolver.channel_key(path))
+    if not result or (now or time.time()) - result['ts'] > HEALTH_TTL:
+        return UNKNOWN
+    return OK if result['ok'] else DEAD
+
+def arrange(channels, results, mode):
+    # mode 'sort' moves dead channels to the end, 'hide' drops them; either
+    # keeps the listing order otherwise. Only stored results are used.
+    if mode not in ('sort', 'hide') or not results:
+        return channels
+    now = time.time()
+    if mode == 'hide':
+        return [c for c in channels if state(results, c[0], now) != DEAD]
+    return sorted(channels, key=lambda c: state(results, c[0], now))
@@ -0,0 +1,94 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import re
+import bisect
+import unicodedata
+from resources.lib import cache, sources
+
+# Country menu entry -> name tokens that identify it. Channels matching none
+# of them are listed under Misc.
+COUNTRIES = {
+    'USA': ['usa', 'us'],
+    'UK': ['uk', 'gb'],
+    'Spain': ['spain', 'es'],
+    'Canada': ['canada', 'ca'],
+    'Australia': ['australia', 'au'],
+    'Mexico': ['mexico', 'mx'],
+    'Germany': ['germany', 'de'],
+    'India': ['india', 'in'],
+    'France': ['france', 'fr'],
+    'Portugal': ['portugal', 'pt'],
+    'Italy': ['italy', 'it'],
+    'Arabic': ['arabic', 'arabia']
+}
+MISC = 'Misc'
+_COUNTRY_TOKENS = {token: country for country, tokens in COUNTRIES.items() for token in tokens}
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'[^0-9a-z]+', ' ', text.lower()).strip()
+
+def tokens(text):
+    return normalize(text).split()
+
+def country_of(name):
+    # Country suffixes are the convention ("ABC USA", "BBC One UK"), so the
+    # last token wins; two-letter codes only count in that position so names
+    # like "US Open" or "IT Crowd" do not get misfiled.
+    words = tokens(name)
+    if not words:
+        return MISC
+    if words[-1] in _COUNTRY_TOKENS:
+        return _COUNTRY_TOKENS[words[-1]]
+    for word in reversed(words):
+        if len(word) > 2 and word in _COUNTRY_TOKENS:
+            return _COUNTRY_TOKENS[word]
+    return MISC
+
+def build_index(all_channels):
+    # channels: [path, name, adult]; countries: country -> positions;
+    # terms/postings: sorted name tokens and the positions containing them,
+    # so a prefix query is a bisect into terms
+    index = {'channels': [], 'countries': {}, 'terms': [], 'postings': []}
+    term_postings = {}
+    for pos, (path, name, adult) in enumerate(all_channels):
+        index['channels'].append([path, name, adult])
+        index['countries'].setdefault(country_of(name), []).append(pos)
+        for token in set(tokens(name)):
+            term_postings.setdefault(token, []).append(pos)
+    index['terms'] = sorted(term_postings)
+    index['postings'] = [term_postings[term] for term in index['terms']]
+    return index
+
+def get_index(load_raw):
+    return cache.derived('livetv_index', 'channels', load_raw, build_index, sources.CACHE_TTL)
+
+def _visible(index, positions, adult):
+    return [index['channels'][pos] for pos in sorted(positions) if adult or not index['channels'][pos][2]]
+
+def by_country(index, country, adult=False):
+    return _visible(index, index['countries'].get(country, []), adult)
+
+def prefix_positions(index, prefix):
+    terms = index['terms']
+    positions = set()
+    i = bisect.bisect_left(terms, prefix)
+    while i < len(terms) and terms[i].startswith(prefix):
+        positions.update(index['postings'][i])
+        i += 1
+    return positions
+
+def search(index, query, adult=False):
+    # Every word of the query has to prefix-match some word of the name
+    positions = None
+    for word in tokens(query):
+        matches = prefix_positions(index, word)
+        positions = matches if positions is None else positions & matches
+        if not positions:
+            return []
+    return _visible(index, positions or [], adult)
@@ -0,0 +1,89 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import re
+import time
+import calendar
+from datetime import datetime, timedelta, timezone
+from resources.lib import logger
+
+MONTHS = {name: number for number, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+SCHEDULE_DATE = re.compile(r'(\d{1,2})(?:st|nd|rd|th)?\s+([A-Za-z]{3})[a-z]*\s+(\d{4})')
+_zone_warned = set()
+
+def snapshot(addon):
+    # Every time related setting, read once per invocation
+    return {
+        'time_format': addon.getSetting('time_format') or '12h',
+        'epg_timezone': addon.getSetting('epg_timezone') or '0',
+        'dst_enabled': addon.getSettingBool('dst_enabled'),
+        'tz_name': addon.getSetting('tz_name').strip()
+    }
+
+def get_zone(settings):
+    # A named zone needs the tz database, which not every Kodi python ships;
+    # without it the fixed offset and the manual DST toggle still apply
+    if settings['tz_name']:
+        try:
+            from zoneinfo import ZoneInfo
+            return ZoneInfo(settings['tz_name'])
+        except Exception as e:
+            if settings['tz_name'] not in _zone_warned:
+                _zone_warned.add(settings['tz_name'])
+                logger.log(f"Time zone {settings['tz_name']!r} is not available ({e!r}), "
+                           f"using the timezone offset setting instead", logger.WARNING)
+    if settings['epg_timezone'] == 'auto':
+        return None
+    try:
+        hours = int(settings['epg_timezone'])
+    except ValueError:
+        hours = 0
+    if settings['dst_enabled']:
+        hours += 1
+    return timezone(timedelta(hours=hours))
+
+def cache_key(settings):
+    # The device zone can change its offset under us, so it is part of the key
+    key = [settings['time_format'], settings['epg_timezone'], settings['dst_enabled'], settings['tz_name']]
+    if get_zone(settings) is None:
+        key.append(time.localtime().tm_gmtoff)
+    return key
+
+def formatter(settings):
+    # Returns a function turning a UTC timestamp into a display time. Labels are
+    # memoized, events of one schedule share a handful of distinct start times.
+    zone = get_zone(settings)
+    twelve_hour = settings['time_format'] == '12h'
+    pattern = '%I:%M %p' if twelve_hour else '%H:%M'
+    labels = {}
+    def format_time(timestamp):
+        label = labels.get(timestamp)
+        if label is None:
+            moment = datetime.fromtimestamp(timestamp, timezone.utc).astimezone(zone)
+            label = moment.strftime(pattern)
+            if twelve_hour:
+                label = label.lstrip('0')
+            labels[timestamp] = label
+        return label
+    return format_time
+
+def schedule_day(date_key):
+    # "Saturday 18th Oct 2026 - Schedule Time UK GMT" -> midnight UTC of that day,
+    # today when the heading cannot be read
+    match = SCHEDULE_DATE.search(date_key or '')
+    if match and match.group(2).lower() in MONTHS:
+        day, month, year = int(match.group(1)), MONTHS[match.group(2).lower()], int(match.group(3))
+        return calendar.timegm((year, month, day, 0, 0, 0))
+    now = int(time.time())
+    return now - now % 86400
+
+def event_timestamp(day, time_str):
+    try:
+        hours, minutes = time_str.split(':', 1)
+        return day + int(hours) * 3600 + int(minutes[:2]) * 60
+    except (AttributeError, ValueError):
+        return None
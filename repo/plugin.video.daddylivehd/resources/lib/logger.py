@@ -0,0 +1,68 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import os
+import logging
+import logging.handlers
+import xbmc
+import xbmcvfs
+import xbmcaddon
+
+LOG_FILE = os.path.join(xbmcvfs.translatePath('special://logpath/'), 'daddylivehd.log')
+SERVICE_LOG_FILE = os.path.join(xbmcvfs.translatePath('special://logpath/'), 'daddylivehd-service.log')
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 1
+BUFFER_RECORDS = 50
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+class _FileHandler(logging.handlers.RotatingFileHandler):
+    def handleError(self, record):
+        try:
+            xbmc.log(f'[ Daddylive ] Logging Failure: {record.getMessage()}', xbmc.LOGWARNING)
+        except Exception:
+            pass
+
+def _target(path):
+    target = _FileHandler(path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding='utf-8', delay=True)
+    target.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s: \n    %(message)s', '%Y-%m-%d %H:%M:%S'))
+    return target
+
+def _setup():
+    # Records are kept in memory and written in one go when the buffer
+    # fills, an error is logged, or the invocation ends (flush()). The file
+    # is opened lazily and rotated once it passes MAX_BYTES.
+    logger = logging.getLogger('daddylivehd')
+    logger.propagate = False
+    debug = xbmcaddon.Addon(id='plugin.video.daddylivehd').getSettingBool('debug_logging')
+    logger.setLevel(DEBUG if debug else INFO)
+    logger.addHandler(logging.handlers.MemoryHandler(BUFFER_RECORDS, flushLevel=ERROR, target=_target(LOG_FILE)))
+    return logger
+
+def use_file(path):
+    # The service and plugin invocations run in the same Kodi process; with
+    # one file each, only one writer ever rotates it and no open handle of
+    # the long running service blocks or outlives a rotation
+    for handler in logger.handlers:
+        handler.flush()
+        handler.target.close()
+        handler.setTarget(_target(path))
+
+logger = _setup()
+
+def log(msg, level=INFO):
+    logger.log(level, msg)
+
+def debug(msg, *args):
+    # Formatting is deferred, so this is close to free when debug logging is off
+    logger.debug(msg, *args)
+
+def flush():
+    for handler in logger.handlers:
+        handler.flush()
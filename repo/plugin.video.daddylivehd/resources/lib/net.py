@@ -0,0 +1,62 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+from resources.lib import stats
+
+UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36'
+TIMEOUT = 15
+POOL_HOSTS = 10
+POOL_PER_HOST = 4
+
+# Sent for page navigations on the main site, on top of the session defaults
+DOCUMENT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en',
+    'Upgrade-Insecure-Requests': '1',
+    'DNT': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-GPC': '1'
+}
+
+_session = None
+
+def session():
+    # One keep-alive session per interpreter so every request to the same
+    # host reuses an open socket instead of paying TCP and TLS setup again.
+    # pool_block caps the number of parallel connections to any single host.
+    # requests is imported here rather than at module level: it is by far the
+    # most expensive import and most invocations are served from the cache.
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from requests.utils import DEFAULT_ACCEPT_ENCODING
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_PER_HOST, pool_block=True)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+        _session.headers.update({
+            'User-Agent': UA,
+            'Accept-Encoding': DEFAULT_ACCEPT_ENCODING,
+            'Connection': 'keep-alive'
+        })
+    return _session
+
+def request(method, url, **kwargs):
+    kwargs.setdefault('timeout', TIMEOUT)
+    with stats.span('http'):
+        return session().request(method, url, **kwargs)
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+def head(url, **kwargs):
+    return request('HEAD', url, **kwargs)
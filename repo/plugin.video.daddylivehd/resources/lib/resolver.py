@@ -0,0 +1,201 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import re
+import time
+import threading
+from urllib.parse import urlparse, quote_plus
+from resources.lib import cache, net, stats
+
+RESOLVED_TTL = 300  # 5 minutes
+RACE_DEADLINE = 4  # seconds to wait for a healthy stream host
+RACE_WORKERS = 4
+HOST_SMOOTHING = 0.3  # weight of a new latency sample in the remembered average
+PREFETCH_WORKERS = 3
+
+# store/invalidate/remember read, modify and rewrite a whole entry, which
+# prefetch threads would otherwise do concurrently
+_lock = threading.Lock()
+
+def channel_key(link):
+    # list_gen and getSource build slightly different page urls for the same channel
+    match = re.search(r'stream-([^/.]+)\.php', link)
+    return match.group(1) if match else link
+
+def resolve(link, referer, throttle=lambda url: None):
+    # throttle is called with each url before it is requested
+    headers = {'Referer': referer}
+    throttle(link)
+    resp = net.post(link, headers=headers).text
+    url_1 = re.findall('iframe src="([^"]*)', resp)[0]
+    parsed_url = urlparse(url_1)
+    referer_base = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    throttle(url_1)
+    resp2 = net.post(url_1, headers=headers).text
+    stream_id = re.findall(r"fetch\('([^']*)", resp2)[0]
+    url_2 = re.findall('var channelKey = "([^"]*)', resp2)[0]
+    m3u8 = re.findall(r'(/mono\.m3u8)', resp2)[0]
+    lookup_url = referer_base + stream_id + url_2
+    throttle(lookup_url)
+    url_3 = net.post(lookup_url, headers=headers).text
+    key = re.findall(':"([^"]*)', url_3)[0]
+    return {'key': key, 'channelKey': url_2, 'm3u8': m3u8, 'referer': referer_base}
+
+def stream_paths(setting):
+    # The video stream setting takes one or more comma separated host suffixes
+    return [p.strip() for p in setting.split(',') if p.strip()] or ['']
+
+def manifest_url(resolved, stream_path):
+    key = resolved['key']
+    return f'https://{key}{stream_path}/{key}/{resolved["channelKey"]}{resolved["m3u8"]}'
+
+def stream_url(resolved, stream_path, user_agent=net.UA):
+    referer = quote_plus(resolved['referer'])
+    return (f'{manifest_url(resolved, stream_path)}'
+            f'|Referer={referer}/&Origin={referer}&Keep-Alive=true&User-Agent={quote_plus(user_agent)}')
+
+def stream_headers(resolved, user_agent=net.UA):
+    # The headers Kodi sends with stream_url, for requests made from here
+    return {'Referer': resolved['referer'] + '/', 'Origin': resolved['referer'], 'User-Agent': user_agent}
+
+def probe(url, headers, timeout):
+    # Milliseconds until a playable manifest came back, None if it did not
+    start = time.perf_counter()
+    try:
+        resp = net.get(url, headers=headers, timeout=timeout)
+        healthy = resp.status_code == 200 and resp.text.lstrip().startswith('#EXTM3U')
+    except Exception:
+        healthy = False
+    return (time.perf_counter() - start) * 1000 if healthy else None
+
+def load_hosts():
+    return cache.read('hosts')[0] or {}
+
+def _host_rank(info):
+    # Known good hosts by latency, then hosts never tried, then failing ones
+    if not info:
+        return (1, 0)
+    if not info['ok']:
+        return (2, 0)
+    return (0, info['ms'])
+
+def remember(results):
+    # results: host -> latency in ms, None for a failed probe
+    with _lock:
+        hosts = load_hosts()
+        now = time.time()
+        for host, latency in results.items():
+            info = hosts.get(host)
+            if latency is None:
+                hosts[host] = {'ms': info['ms'] if info else None, 'ok': False, 'ts': now}
+                continue
+            if info and info['ms'] is not None:
+                latency = info['ms'] + HOST_SMOOTHING * (latency - info['ms'])
+            hosts[host] = {'ms': round(latency, 1), 'ok': True, 'ts': now}
+        try:
+            cache.write('hosts', hosts)
+        except OSError:
+            pass
+
+def race(resolved, paths, deadline=RACE_DEADLINE):
+    # Probes the manifest on every candidate host at once and returns
+    # (stream_path, latency) of the first healthy one, or (None, None) when
+    # none answered in time. Candidates are submitted in remembered latency
+    # order, so with more hosts than workers the likely winners go first.
+    hosts = load_hosts()
+    ordered = sorted(paths, key=lambda p: _host_rank(hosts.get(resolved['key'] + p)))
+    headers = stream_headers(resolved)
+    from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+    pool = ThreadPoolExecutor(max_workers=min(RACE_WORKERS, len(ordered)))
+    futures = {pool.submit(probe, manifest_url(resolved, p), headers, deadline): p for p in ordered}
+    results = {}
+    winner = None, None
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            path = futures[future]
+            results[resolved['key'] + path] = future.result()
+            if future.result() is not None:
+                winner = path, future.result()
+                break
+    except TimeoutError:
+        pass
+    for future in futures:
+        future.cancel()
+    pool.shutdown(wait=False)
+    remember(results)
+    return winner
+
+def _load():
+    return cache.read('streams')[0] or {}
+
+def _save(entries):
+    now = time.time()
+    try:
+        cache.write('streams', {k: v for k, v in entries.items() if now - v['ts'] < RESOLVED_TTL})
+    except OSError:
+        pass
+
+def cached(link):
+    entry = _load().get(channel_key(link))
+    if entry and time.time() - entry['ts'] < RESOLVED_TTL:
+        return entry['resolved']
+    return None
+
+def store(link, resolved):
+    with _lock:
+        entries = _load()
+        entries[channel_key(link)] = {'ts': time.time(), 'resolved': resolved}
+        _save(entries)
+
+def invalidate(link):
+    with _lock:
+        entries = _load()
+        if entries.pop(channel_key(link), None) is not None:
+            _save(entries)
+
+def lookup(link, referer, paths=('',)):
+    # Returns (resolved, from_cache). resolved['stream_path'] is the host
+    # suffix to play from; with several candidates it is the fastest host
+    # that served the manifest, and resolved['probe_ms'] is None if no host
+    # answered, in which case the result is not cached.
+    resolved = cached(link)
+    stats.count('streams', bool(resolved))
+    if resolved and resolved.get('stream_path') in paths:
+        return resolved, True
+    return _resolve(link, referer, paths, resolved), False
+
+def _resolve(link, referer, paths, resolved=None):
+    if not resolved:
+        with stats.span('resolve'):
+            resolved = resolve(link, referer)
+    if len(paths) > 1:
+        with stats.span('race'):
+            resolved['stream_path'], resolved['probe_ms'] = race(resolved, paths)
+        if resolved['stream_path'] is None:
+            resolved['stream_path'] = paths[0]
+            return resolved
+    else:
+        resolved['stream_path'], resolved['probe_ms'] = paths[0], None
+    store(link, resolved)
+    return resolved
+
+def _prefetch_one(link, referer, paths):
+    resolved = cached(link)
+    if resolved and resolved.get('stream_path') in paths:
+        return
+    _resolve(link, referer, paths, resolved)
+
+def prefetch(links, referer, paths=('',), deadline=30):
+    # Resolves links into the store ahead of playback, a few at a time.
+    # Returns (resolved, failed, unfinished) counts; unfinished ones keep
+    # running after the deadline and still land in the store.
+    from concurrent.futures import ThreadPoolExecutor, wait
+    pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+    futures = [pool.submit(_prefetch_one, link, referer, paths) for link in links]
+    done, pending = wait(futures, timeout=deadline)
+    pool.shutdown(wait=False)
+    failed = sum(1 for future in done if future.exception())
+    return len(done) - failed, failed, len(pending)
@@ -0,0 +1,129 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import html
+import json
+import hashlib
+from resources.lib import cache, localtime, sources
+
+# Bumped whenever event ids or the index layout change, so older cached indexes are rebuilt
+INDEX_VERSION = 2
+
+def clean_category_name(name):
+    if isinstance(name, str):
+        name = html.unescape(name).strip()
+    return name
+
+def event_ref(date_key, categ, time_str, event):
+    # Short id that stays the same across schedule refreshes, used in plugin urls instead of the event itself.
+    # The date is part of it, so a show listed on several days keeps one entry per day.
+    return hashlib.sha1(f'{date_key}|{categ}|{time_str}|{event}'.encode('utf-8')).hexdigest()[:10]
+
+def normalize_channels(channels):
+    if isinstance(channels, dict):
+        channels = list(channels.values())
+    if isinstance(channels, list) and all(isinstance(channel, dict) for channel in channels):
+        return [{'channel_name': channel.get('channel_name'), 'channel_id': channel.get('channel_id')} for channel in channels]
+    return None
+
+def block_hash(events_list):
+    return hashlib.sha1(json.dumps(events_list, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def _add_event(index, categ, event_id, entry):
+    if event_id in index['events']:
+        return
+    index['events'][event_id] = entry
+    index['by_category'][categ].append(event_id)
+    if categ.lower() == 'basketball' and 'NBA' in str(entry['event']).upper():
+        index['nba'].setdefault(categ, []).append(event_id)
+
+def build_index(raw, settings, previous=None):
+    # categories keeps the display order, by_category and nba hold event ids,
+    # events holds everything a listing or the channel view needs, already formatted.
+    # blocks remembers a hash and the event ids of every date/category list, so
+    # with the previous index at hand unchanged lists are copied over as they are.
+    index = {'categories': [], 'by_category': {}, 'nba': {}, 'events': {}, 'invalid': 0, 'blocks': {}}
+    old_blocks = previous.get('blocks', {}) if previous else {}
+    format_time = localtime.formatter(settings)
+    for date_key, categs in raw.items():
+        day = localtime.schedule_day(date_key)
+        for categ, events_list in categs.items():
+            categ = clean_category_name(categ)
+            if categ not in index['by_category']:
+                index['categories'].append(categ)
+                index['by_category'][categ] = []
+            block = f'{date_key}|{categ}'
+            digest = block_hash(events_list)
+            old = old_blocks.get(block)
+            if old and old[0] == digest:
+                for event_id in old[1]:
+                    _add_event(index, categ, event_id, previous['events'][event_id])
+                index['invalid'] += old[2]
+                index['blocks'][block] = old
+                continue
+            ids, invalid = [], 0
+            for item in events_list:
+                event = item.get('event')
+                time_str = item.get('time')
+                channels = normalize_channels(item.get('channels'))
+                if channels is None:
+                    invalid += 1
+                    continue
+                event_id = event_ref(date_key, categ, time_str, event)
+                timestamp = localtime.event_timestamp(day, time_str)
+                label = format_time(timestamp) if timestamp is not None else time_str
+                ids.append(event_id)
+                _add_event(index, categ, event_id, {
+                    'title': f'{label} {event}',
+                    'event': event,
+                    'time': time_str,
+                    'ts': timestamp,
+                    'categ': categ,
+                    'date': date_key,
+                    'channels': channels
+                })
+            index['invalid'] += invalid
+            index['blocks'][block] = [digest, ids, invalid]
+    return index
+
+def diff(previous, index):
+    # What a refresh changed, by event id. Ids are derived from date, category,
+    # time and name, so an event whose channels were swapped keeps its id.
+    old, new = previous['events'], index['events']
+    return {
+        'added': [event_id for event_id in new if event_id not in old],
+        'removed': [event_id for event_id in old if event_id not in new],
+        'channels': [event_id for event_id in new if event_id in old and new[event_id]['channels'] != old[event_id]['channels']]
+    }
+
+def update_index(previous, raw, settings):
+    # Only a refresh that changed some event replaces the stored delta; a
+    # rebuild from the same schedule or for new settings leaves it alone
+    index = build_index(raw, settings, previous)
+    delta = diff(previous, index)
+    if any(delta.values()):
+        cache.write('schedule_delta', delta)
+    return index
+
+def get_index(load_raw, settings):
+    return cache.derived('schedule_index', 'schedule', load_raw,
+                         lambda raw: build_index(raw, settings), sources.CACHE_TTL,
+                         [INDEX_VERSION] + localtime.cache_key(settings),
+                         lambda previous, raw: update_index(previous, raw, settings))
+
+def changes():
+    # Delta of the last refresh that changed the schedule, None before the first
+    return cache.read('schedule_delta')[0]
+
+def category_events(index, categ):
+    return [dict(index['events'][event_id], id=event_id) for event_id in index['by_category'].get(categ, [])]
+
+def nba_events(index, categ):
+    return [dict(index['events'][event_id], id=event_id) for event_id in index['nba'].get(categ, [])]
+
+def event_channels(index, event_id):
+    event = index['events'].get(event_id)
+    return event['channels'] if event else []
@@ -0,0 +1,87 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import re
+import codecs
+from resources.lib import cache, net, stats
+
+CACHE_TTL = 600  # 10 minutes
+CACHE_STALE = 3600  # serve expired data for up to 1 hour while refreshing
+CHUNK_SIZE = 65536
+
+# The 24/7 list sits between the page heading and the second tab; each
+# channel is one line with the stream link and its name in <strong>
+CHANNELS_START = '<center><h1'
+CHANNELS_END = 'tab-2'
+CHANNEL_LINK = re.compile(r'href="([^"\n]*)"\s+target[^\n]*?<strong>([^<\n]*)</strong>')
+
+def fetch_schedule(schedule_url, referer):
+    hea = dict(net.DOCUMENT_HEADERS, Referer=referer)
+    response = net.get(schedule_url, headers=hea, timeout=10)
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch data: {response.status_code}")
+    with stats.span('parse.schedule'):
+        return response.json()
+
+def fetch_channels(baseurl):
+    # The page is fed to the extractor chunk by chunk as it arrives
+    url = baseurl + '/24-7-channels.php'
+    hea = {'Referer': baseurl + '/'}
+    resp = net.post(url, headers=hea, stream=True)
+    decoder = codecs.getincrementaldecoder(resp.encoding or 'utf-8')(errors='replace')
+
+    def page():
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+
+    with stats.span('parse.channels'):
+        all_channels = [list(c) for c in extract_channels(page())]
+    resp.close()
+    if not all_channels:
+        raise Exception("No channels found on the 24/7 page")
+    return all_channels
+
+def extract_channels(chunks):
+    # Single pass over the page text as it arrives, yielding (path, name, adult).
+    # Records never span lines, so only the unfinished last line is carried
+    # over between chunks.
+    buffer = ''
+    in_block = False
+    for chunk in chunks:
+        buffer += chunk
+        if not in_block:
+            start = buffer.find(CHANNELS_START)
+            if start < 0:
+                buffer = buffer[-len(CHANNELS_START):]
+                continue
+            in_block = True
+            buffer = buffer[start:]
+        end = buffer.find(CHANNELS_END)
+        pos = 0
+        for match in CHANNEL_LINK.finditer(buffer, 0, end if end >= 0 else len(buffer)):
+            name = match.group(2).strip()
+            yield match.group(1), name, '18+' in name
+            pos = match.end()
+        if end >= 0:
+            return
+        buffer = buffer[max(pos, buffer.rfind('\n') + 1):]
+
+def get_schedule(schedule_url, referer):
+    return cache.get('schedule', lambda: fetch_schedule(schedule_url, referer), CACHE_TTL, CACHE_STALE)
+
+def get_channels(baseurl):
+    return cache.get('channels', lambda: fetch_channels(baseurl), CACHE_TTL, CACHE_STALE)
+
+def refresh_schedule(schedule_url, referer):
+    schedule = fetch_schedule(schedule_url, referer)
+    cache.write('schedule', schedule)
+    return schedule
+
+def refresh_channels(baseurl):
+    all_channels = fetch_channels(baseurl)
+    cache.write('channels', all_channels)
+    return all_channels
@@ -0,0 +1,84 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+WINDOW = 200  # samples kept per stage
+
+_lock = threading.Lock()
+_timings = {}
+_counters = {}
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, (time.perf_counter() - started) * 1000)
+
+def record(stage, ms):
+    with _lock:
+        _timings.setdefault(stage, []).append(round(ms, 1))
+
+def count(name, hit):
+    # Cache lookups; hit is False for a miss
+    with _lock:
+        counter = _counters.setdefault(name, [0, 0])
+        counter[0 if hit else 1] += 1
+
+def _path():
+    from resources.lib import cache
+    return cache.path('stats.json')
+
+def load():
+    try:
+        with open(_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'timings': {}, 'counters': {}}
+
+def save():
+    # Merge this invocation's samples into the rolling window on disk
+    from resources.lib import cache
+    with _lock:
+        if not _timings and not _counters:
+            return
+        timings, counters = dict(_timings), dict(_counters)
+        _timings.clear()
+        _counters.clear()
+    data = load()
+    for stage, samples in timings.items():
+        data['timings'][stage] = (data['timings'].get(stage, []) + samples)[-WINDOW:]
+    for name, (hits, misses) in counters.items():
+        total = data['counters'].get(name, [0, 0])
+        data['counters'][name] = [total[0] + hits, total[1] + misses]
+    try:
+        cache.atomic_write(_path(), json.dumps(data, separators=(',', ':')))
+    except OSError:
+        pass
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def summary():
+    data = load()
+    lines = ['Stage                          p50 ms   p95 ms      n']
+    for stage in sorted(data['timings']):
+        samples = data['timings'][stage]
+        if samples:
+            lines.append(f'{stage:<28} {percentile(samples, 50):>8} {percentile(samples, 95):>8} {len(samples):>6}')
+    lines.append('')
+    lines.append('Cache                          hits   misses   hit rate')
+    for name in sorted(data['counters']):
+        hits, misses = data['counters'][name]
+        rate = hits / (hits + misses) * 100 if hits + misses else 0
+        lines.append(f'{name:<28} {hits:>6} {misses:>8} {rate:>9.0f}%')
+    return '\n'.join(lines)
@@ -0,0 +1,129 @@
+'''
+**********************************************************
+*@license GNU General Public License, version 3 (GPL-3.0)*
+**********************************************************
+'''
+
+import time
+import random
+import threading
+import xbmc
+import xbmcaddon
+from resources.lib import cache, epg, health, localtime, logger, resolver, schedule, sources, stats
+from resources.lib.channel_matches import CHANNEL_MATCHES
+
+ADDON_ID = 'plugin.video.daddylivehd'
+# Refresh comfortably before the plugin would consider the data expired
+SCHEDULE_INTERVAL = sources.CACHE_TTL * 0.8
+LIVETV_INTERVAL = sources.CACHE_TTL * 0.8
+EPG_INTERVAL = epg.EPG_TTL * 0.9
+RETRY_MIN = 30
+JITTER = 0.1
+IDLE_CHECK = 300
+
+def log(msg, level=logger.INFO):
+    logger.log(f'service: {msg}', level)
+
+def refresh_schedule():
+    addon = xbmcaddon.Addon(id=ADDON_ID)
+    baseurl = addon.getSetting('baseurl').strip()
+    raw = sources.refresh_schedule(baseurl + addon.getSetting('schedule_path').strip(), baseurl)
+    # Bring the event index up to date here, reusing every unchanged
+    # category, so the plugin opens LIVE SPORTS from a current index
+    last_delta = cache.stamp('schedule_delta')
+    schedule.get_index(lambda: raw, localtime.snapshot(addon))
+    if cache.stamp('schedule_delta') != last_delta:
+        delta = schedule.changes()
+        log(f"schedule: {len(delta['added'])} new events, {len(delta['removed'])} removed, "
+            f"{len(delta['channels'])} with changed channels")
+
+def refresh_channels():
+    sources.refresh_channels(xbmcaddon.Addon(id=ADDON_ID).getSetting('baseurl').strip())
+
+def refresh_epg():
+    # The guide is several hundred MB, so it has its own switch and gives up
+    # as soon as Kodi asks to shut down; a partial download is resumed later
+    addon = xbmcaddon.Addon(id=ADDON_ID)
+    if not addon.getSettingBool('epg_enabled'):
+        return
+    try:
+        epg.refresh(epg.EPG_URL, should_stop=xbmc.Monitor().abortRequested)
+    except epg.Aborted:
+        return
+    # Match the channel list against the new guide here rather than on the next listing
+    epg.get_matches(lambda: sources.get_channels(addon.getSetting('baseurl').strip()), CHANNEL_MATCHES)
+
+_health_pass = None
+
+def check_health():
+    # A full pass takes minutes, so it runs beside the other jobs instead of
+    # holding up the next schedule refresh
+    global _health_pass
+    addon = xbmcaddon.Addon(id=ADDON_ID)
+    if not addon.getSettingBool('health_check') or (_health_pass and _health_pass.is_alive()):
+        return
+    baseurl = addon.getSetting('baseurl').strip()
+    paths = resolver.stream_paths(addon.getSetting('stream_path'))
+    all_channels = sources.get_channels(baseurl)
+
+    def run_pass():
+        started = time.time()
+        try:
+            working, dead = health.run(all_channels, baseurl, paths, xbmc.Monitor().abortRequested)
+            log(f'health check: {working} working, {dead} dead in {time.time() - started:.0f}s')
+        except Exception as e:
+            log(f'health check failed: {e}', logger.WARNING)
+
+    _health_pass = threading.Thread(target=run_pass)
+    _health_pass.start()
+
+def jittered(seconds):
+    return seconds * random.uniform(1 - JITTER, 1 + JITTER)
+
+class Job:
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.failures = 0
+        self.due = time.time() + jittered(5)
+
+    def run(self):
+        try:
+            self.func()
+            self.failures = 0
+            self.due = time.time() + jittered(self.interval)
+        except Exception as e:
+            # Exponential backoff on errors, never waiting longer than the normal interval
+            self.failures += 1
+            self.due = time.time() + jittered(min(self.interval, RETRY_MIN * 2 ** (self.failures - 1)))
+            log(f'{self.name} refresh failed ({self.failures}): {e}', logger.WARNING)
+
+def run():
+    logger.use_file(logger.SERVICE_LOG_FILE)
+    monitor = xbmc.Monitor()
+    jobs = [
+        Job('schedule', refresh_schedule, SCHEDULE_INTERVAL),
+        Job('channels', refresh_channels, LIVETV_INTERVAL),
+        Job('epg', refresh_epg, EPG_INTERVAL),
+        Job('health', check_health, health.HEALTH_INTERVAL)
+    ]
+    while not monitor.abortRequested():
+        if not xbmcaddon.Addon(id=ADDON_ID).getSettingBool('service_enabled'):
+            if monitor.waitForAbort(IDLE_CHECK):
+                break
+            continue
+        for job in jobs:
+            if time.time() >= job.due:
+                job.run()
+            if monitor.abortRequested():
+                stats.save()
+                logger.flush()
+                return
+        stats.save()
+        logger.flush()
+        if monitor.waitForAbort(max(1, min(job.due for job in jobs) - time.time())):
+            break
+
+if __name__ == '__main__':
+    run()